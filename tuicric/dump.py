@@ -1,103 +1,164 @@
 """
 Tools for dumping SysEx data.
 """
-# pylint: disable=missing-super-argument, redefined-builtin
 from __future__ import absolute_import, division, print_function
 
-import io
 import binascii
 import logging
+import operator
+import pathlib
 import re
 import argparse
-from builtins import (bytes, str, super)
-from tabulate import tabulate
 
 
+# Graphviz ids only need ASCII word characters, which avoids \W's Unicode tables
+_NON_WORD_RE = re.compile(r'[^0-9A-Za-z_]')
+
+def _make_id(string):
+    return _NON_WORD_RE.sub('', string.lower())
+
+def _gv_str_attr(attrs):
+    response = ''
+    if attrs:
+        response += ' [%s]' % ','.join([
+            "%s=%s" % (key, value) for key, value in attrs.items()
+        ])
+    return response
+
+
+def _format_table(rows, headers):
+    """Lay rows out in plain columns, with numbers right aligned."""
+
+    widths = [
+        max([len(header) + 2] + [len(str(row[column])) for row in rows])
+        for column, header in enumerate(headers)
+    ]
+    aligns = [
+        '>' if rows and all(isinstance(row[column], int) for row in rows) else '<'
+        for column in range(len(headers))
+    ]
+
+    def format_row(row):
+        return '  '.join([
+            format(str(cell), '%s%d' % (align, width))
+            for cell, align, width in zip(row, aligns, widths)
+        ]).rstrip()
+
+    return '\n'.join(
+        [format_row(headers), '  '.join(['-' * width for width in widths])]
+        + [format_row(row) for row in rows]
+    )
 
 class GraphvizMixin(object):
     """Mixin for objects with a graphviz representation."""
 
+    __slots__ = ('name', '_gv_id')
+
     signal_attrs = {'style':'bold', 'color': 'red'}
     data_attrs = {'style':'dashed', 'color': 'blue'}
     handle_attrs = {'style': 'bold', 'shape': 'record'}
     param_attrs = {'shape':'record'}
 
+    # The attribute sets above never change, so render them up front
+    signal_attrs_str = _gv_str_attr(signal_attrs)
+    data_attrs_str = _gv_str_attr(data_attrs)
+    handle_attrs_str = _gv_str_attr(handle_attrs)
+    param_attrs_str = _gv_str_attr(param_attrs)
+
     def __init__(self, name=''):
         self.name = name
+        self._gv_id = self.make_id(name)
 
     def make_id(self, string):
         """Make an id suitable for Graphviz from a string."""
 
-        response = string.lower()
-        response = re.sub(r'\W', '', response)
-        return '%s' % response
+        return _make_id(string)
 
     def to_gv(self, indentation=0):
         raise NotImplementedError()
 
     @property
     def gv_id(self):
-        return self.make_id(self.name)
+        return self._gv_id
 
     @classmethod
     def line_delimeter(cls, indentation=0):
         return '\n' + ('\t' * indentation)
 
+    def gv_block(self, header, indentation=0):
+        """Graphviz block of the object's components, opened by header."""
+
+        inner_delimeter = self.line_delimeter(indentation + 1)
+        return ''.join([
+            header,
+            inner_delimeter,
+            inner_delimeter.join(self.gv_components(indentation + 1)),
+            self.line_delimeter(indentation),
+            '}'
+        ])
+
     @classmethod
     def gv_str_attr(cls, attrs):
         """Return a graphviz string representation of a set of attributes."""
 
-        response = ''
-        if attrs:
-            response += ' [%s]' % ','.join([
-                "%s=%s" % (key, value) for key, value in attrs.items()
-            ])
-        return response
+        return _gv_str_attr(attrs)
 
     @classmethod
     def gv_connection(cls, from_id, to_id, edge_attrs=None, edge_type=None):
         response = "%s -> %s" % (from_id, to_id)
-        if edge_attrs is None:
-            edge_attrs = {}
-        if edge_type == 'signal':
-            edge_attrs.update(cls.signal_attrs)
-        elif edge_type == 'data':
-            edge_attrs.update(cls.data_attrs)
         if edge_attrs:
+            edge_attrs = dict(edge_attrs)
+            if edge_type == 'signal':
+                edge_attrs.update(cls.signal_attrs)
+            elif edge_type == 'data':
+                edge_attrs.update(cls.data_attrs)
             response += ' ' + cls.gv_str_attr(edge_attrs)
+        elif edge_type == 'signal':
+            response += ' ' + cls.signal_attrs_str
+        elif edge_type == 'data':
+            response += ' ' + cls.data_attrs_str
         response += ';'
         return response
 
     @classmethod
     def gv_node(cls, node_id, node_attrs=None, node_type=None):
         response = node_id
-        if node_attrs is None:
-            node_attrs = {}
-        if node_type == 'handle':
-            node_attrs.update(cls.handle_attrs)
-        elif node_type == 'param':
-            node_attrs.update(cls.param_attrs)
         if node_attrs:
+            node_attrs = dict(node_attrs)
+            if node_type == 'handle':
+                node_attrs.update(cls.handle_attrs)
+            elif node_type == 'param':
+                node_attrs.update(cls.param_attrs)
             response += ' ' + cls.gv_str_attr(node_attrs)
-        print("gv_node response: %s" % response)
+        elif node_type == 'handle':
+            response += ' ' + cls.handle_attrs_str
+        elif node_type == 'param':
+            response += ' ' + cls.param_attrs_str
         return response
 
 
 
-class SysexInfo(list, GraphvizMixin):
-    """List of `SysexInfoSection`s which contains info about a SysEx message."""
+class SysexInfo(GraphvizMixin):
+    """Sequence of `SysexInfoSection`s which contains info about a SysEx message."""
+
+    __slots__ = ('sections',)
 
     def __init__(self, sections=None, name=''):
         if sections is None:
             sections = []
-        GraphvizMixin.__init__(self, name)
-        list.__init__(self, sections)
+        super().__init__(name)
+        self.sections = tuple(sections)
 
+    def __iter__(self):
+        return iter(self.sections)
+
+    def __len__(self):
+        return len(self.sections)
 
     def gv_components(self, indentation=0):
         """Graphviz components for object."""
 
-        response = [section.to_gv(indentation) for section in self]
+        response = [section.to_gv(indentation) for section in self.sections]
         response += [
             self.gv_connection('handle_oscillator1:out', 'oscillator1level:in', edge_type='signal'),
             self.gv_connection('handle_oscillator2:out', 'oscillator2level:in', edge_type='signal')
@@ -106,61 +167,56 @@ class SysexInfo(list, GraphvizMixin):
 
 
     def to_gv(self, indentation=0):
-        response = "digraph {"
-        indentation += 1
-        response += self.line_delimeter(indentation)
-        response += self.line_delimeter(indentation).join(self.gv_components(indentation))
-        indentation -= 1
-        response += self.line_delimeter(indentation)
-        response += "}"
-        return response
+        return self.gv_block("digraph {", indentation)
+
+class SysexInfoSection(GraphvizMixin):
+    """Sequence of `SysexInfoParam`s which contains info about part of a Sysex message."""
 
-class SysexInfoSection(list, GraphvizMixin):
-    """List of `SysexInfoParam`s which contains info about part of a Sysex message."""
+    __slots__ = ('params',)
 
     def __init__(self, name='', params=None):
         if params is None:
             params = []
-        GraphvizMixin.__init__(self, name)
-        list.__init__(self, params)
+        super().__init__(name)
+        self.params = tuple(params)
+
+    def __iter__(self):
+        return iter(self.params)
+
+    def __len__(self):
+        return len(self.params)
 
     @property
     def gv_id(self):
         """ID for graphviz."""
 
-        return 'cluster_%s' % self.make_id(self.name)
+        return 'cluster_%s' % self._gv_id
 
     def gv_components(self, indentation=0):
         """Graphviz components for object."""
 
         response = [
             self.gv_node(
-                'handle_%s' % self.make_id(self.name),
+                'handle_%s' % self._gv_id,
                 node_attrs={
                     'label':'"<in>|%s|<out>"' % self.name
                 },
                 node_type='handle'
             )
         ]
-        response += [(param.to_gv(indentation) + ';') for param in self]
-        print("gv_components response %s" % response)
+        response += [(param.to_gv(indentation) + ';') for param in self.params]
         return response
 
     def to_gv(self, indentation=0):
         """Graphviz representation of self."""
 
-        response = "subgraph %s {" % self.gv_id
-        indentation += 1
-        response += self.line_delimeter(indentation)
-        response += self.line_delimeter(indentation).join(self.gv_components(indentation))
-        indentation -= 1
-        response += self.line_delimeter(indentation)
-        response += "}"
-        return response
+        return self.gv_block("subgraph %s {" % self.gv_id, indentation)
 
 class SysexInfoSectionOscillator(SysexInfoSection):
     """List of `SysexInfoParam`s specific to a Circuit Oscillator."""
 
+    __slots__ = ()
+
     def __init__(self, name='', offset=0x00):
         params = [
             SysexInfoParamChoiceOscWave(
@@ -196,6 +252,8 @@ class SysexInfoSectionOscillator(SysexInfoSection):
 class SysexInfoSectionMixer(SysexInfoSection):
     """List of `SysexInfoParam`s specific to a Circuit Mixer."""
 
+    __slots__ = ()
+
     def __init__(self, name='', offset=0x00):
         params = [
             SysexInfoParamMap(
@@ -242,12 +300,14 @@ class SysexInfoSectionMixer(SysexInfoSection):
 class SysexInfoSectionEnvelope(SysexInfoSection):
     """List of `SysexInfoParam`s specific to a Circuit Enveloper."""
 
+    __slots__ = ()
+
     def __init__(self, name='', offset=0x00, params=None, defaults=None):
         if defaults is None:
             defaults = {}
         if params is None:
-            defaults = []
-        params += [
+            params = []
+        params = list(params) + [
             SysexInfoParamMap(
                 offset + 0x01, name + ' Attack'
             ),
@@ -273,12 +333,17 @@ class SysexInfoSectionEnvelope(SysexInfoSection):
 class SysexInfoParam(GraphvizMixin):
     """Contains information about a single param within a sysex message."""
 
+    __slots__ = ('offset', 'range_min', 'range_max', 'default', 'raw', '_gv_prefix')
+
+    # Node label layout, filled with the name and the formatted value
+    _LABEL_FMT = "{<mod>m|<in>i}|{%s|%s}|<out>o"
+
     def __init__(self, offset, name='', range_min=0, range_max=127, default=0):
         assert \
             range_min <= range_max, \
             "sanity check: range min <= range max"
         assert \
-            range_min <= default and default <= range_max, \
+            range_min <= default <= range_max, \
             "sanity check: default (%d) within range (%d..%d)" % (
                 default, range_min, range_max
             )
@@ -288,14 +353,20 @@ class SysexInfoParam(GraphvizMixin):
         self.default = default
         self.raw = None
         super().__init__(name)
+        # The node text before the label only depends on the name
+        self._gv_prefix = '%s [shape=record,label="' % self._gv_id
 
-    def format(self, raw):
-        """Format the raw value."""
+    def _check_raw(self, raw):
         assert \
-            self.range_min <= raw and raw <= self.range_max, \
+            self.range_min <= raw <= self.range_max, \
             "raw (%s) should be within range (%s..%s)" % (
                 repr(raw), repr(self.range_min), repr(self.range_max)
             )
+
+    def format(self, raw):
+        """Format the raw value."""
+        if __debug__:
+            self._check_raw(raw)
         return raw
 
     @property
@@ -307,18 +378,25 @@ class SysexInfoParam(GraphvizMixin):
 
     @property
     def label(self):
-        return "{<mod>m|<in>i}|{%s|%s}|<out>o" % (self.name, self.value)
+        return self._LABEL_FMT % (self.name, self.value)
 
     def to_gv(self, indentation=0):
-        return "%s [" % self.gv_id \
-            + "shape=record," \
-            + "label=\"%s\"" % self.label \
-            + "]"
+        return self.gv_template() % (self.value,)
+
+    def gv_template(self):
+        """Graphviz node of self with a `%s` slot in place of the value."""
+
+        return '%s%s"]' % (
+            self._gv_prefix.replace('%', '%%'),
+            self._LABEL_FMT % (self.name.replace('%', '%%'), '%s')
+        )
 
 
 class SysexInfoParamChoice(SysexInfoParam):
     """Contains information about a single multi-choice param within a sysex message."""
 
+    __slots__ = ('choices',)
+
     def __init__(self, offset, name='', choices=None, *args, **kwargs):
         assert \
             len(choices) >= 1, \
@@ -330,46 +408,57 @@ class SysexInfoParamChoice(SysexInfoParam):
         super().__init__(offset, name, *args, **kwargs)
 
     def format(self, raw):
-        raw = super().format(raw)
-        assert \
-            raw < len(self.choices), \
-            "raw %d should be in index of choices: %d" % (raw, len(self.choices))
+        if __debug__:
+            self._check_raw(raw)
+            assert \
+                raw < len(self.choices), \
+                "raw %d should be in index of choices: %d" % (raw, len(self.choices))
         return self.choices[raw]
 
 class SysexInfoParamChoiceOscWave(SysexInfoParamChoice):
     """Contains information about a single wave select param within a sysex message."""
 
+    __slots__ = ()
+
+    _CHOICES = ('sine', 'triangle', 'sawtooth', 'saw 9:1 PW', 'saw 8:2 PW',
+                'saw 7:3 PW', 'saw 6:4 PW', 'saw 5:5 PW', 'saw 4:6 PW',
+                'saw 3:7 PW', 'saw 2:8 PW', 'saw 1:9 PW', 'pulse width',
+                'square', 'sine table', 'analogue pulse', 'analogue sync',
+                'triange-saw blend', 'digital nasty 1', 'digital nasty 2',
+                'digital saw-square', 'digital vocal 1', 'digital vocal 2',
+                'digital vocal 3', 'digital vocal 4', 'digital vocal 5',
+                'digital vocal 6', 'random collection 1',
+                'random collection 2', 'random collection 3')
+
     def __init__(self, offset, name='', *args, **kwargs):
-        choices = ['sine', 'triangle', 'sawtooth', 'saw 9:1 PW', 'saw 8:2 PW',
-                   'saw 7:3 PW', 'saw 6:4 PW', 'saw 5:5 PW', 'saw 4:6 PW',
-                   'saw 3:7 PW', 'saw 2:8 PW', 'saw 1:9 PW', 'pulse width',
-                   'square', 'sine table', 'analogue pulse', 'analogue sync',
-                   'triange-saw blend', 'digital nasty 1', 'digital nasty 2',
-                   'digital saw-square', 'digital vocal 1', 'digital vocal 2',
-                   'digital vocal 3', 'digital vocal 4', 'digital vocal 5',
-                   'digital vocal 6', 'random collection 1',
-                   'random collection 2', 'random collection 3']
-        super().__init__(offset, name, choices, *args, **kwargs)
+        super().__init__(offset, name, self._CHOICES, *args, **kwargs)
 
 class SysexInfoParamChoiceLFOWave(SysexInfoParamChoice):
     """Contains information about a single wave select param within a sysex message."""
 
+    __slots__ = ()
+
+    _CHOICES = ('sine', 'triangle', 'sawtooth', 'square', 'random S/H',
+                'time S/H', 'piano envelope', 'sequence 1', 'sequence 2',
+                'sequence 3', 'sequence 4', 'sequence 5', 'sequence 6',
+                'sequence 7', 'alternative 1', 'alternative 2',
+                'alternative 3', 'alternative 4', 'alternative 5',
+                'alternative 6', 'alternative 7', 'alternative 8',
+                'chromatic', 'chromatic 16', 'major', 'major 7',
+                'minor 7', 'minor arp 1', 'minor arp 2', 'diminished',
+                'dec minor', 'minor 3rd', 'pedal', '4ths', '4ths x 12',
+                '1625 Maj', '1625 Min', '2511')
+
     def __init__(self, offset, name='', *args, **kwargs):
-        choices = ['sine', 'triangle', 'sawtooth', 'square', 'random S/H',
-                   'time S/H', 'piano envelope', 'sequence 1', 'sequence 2',
-                   'sequence 3', 'sequence 4', 'sequence 5', 'sequence 6',
-                   'sequence 7', 'alternative 1', 'alternative 2',
-                   'alternative 3', 'alternative 4', 'alternative 5',
-                   'alternative 6', 'alternative 7', 'alternative 8',
-                   'chromatic', 'chromatic 16', 'major', 'major 7',
-                   'minor 7', 'minor arp 1', 'minor arp 2', 'diminished',
-                   'dec minor', 'minor 3rd', 'pedal', '4ths', '4ths x 12',
-                   '1625 Maj', '1625 Min', '2511']
-        super().__init__(offset, name, choices, *args, **kwargs)
+        super().__init__(offset, name, self._CHOICES, *args, **kwargs)
 
 class SysexInfoParamMap(SysexInfoParam):
     """Contains information about a single mapped param within a sysex message."""
 
+    __slots__ = (
+        'map_min', 'map_max', 'fmt_str', '_scale', '_offset_min', '_map_type', '_formatted'
+    )
+
     def __init__(self, offset, name='', map_min=0, map_max=100, fmt_str='%s%%', *args, **kwargs):
         assert \
             isinstance(map_min, type(map_max)), \
@@ -380,17 +469,25 @@ class SysexInfoParamMap(SysexInfoParam):
         self.map_max = map_max
         self.fmt_str = fmt_str
         super().__init__(offset, name, *args, **kwargs)
+        # raw -> mapped is linear, so fold the ranges into a scale and offset once
+        self._scale = (self.map_max - self.map_min) / (self.range_max - self.range_min)
+        self._offset_min = self.map_min - self.range_min * self._scale
+        self._map_type = type(self.map_min)
+        # raw values are 7-bit, so at most 128 formatted values per param
+        self._formatted = {}
 
     def format(self, raw):
-        raw = super().format(raw)
-        mapped = (raw - self.range_min) * (self.map_max - self.map_min) \
-                / (self.range_max - self.range_min) + self.map_min
-        mapped_type = type(self.map_min)
-        return self.fmt_str % mapped_type(mapped)
+        formatted = self._formatted.get(raw)
+        if formatted is None:
+            if __debug__:
+                self._check_raw(raw)
+            formatted = self.fmt_str % self._map_type(raw * self._scale + self._offset_min)
+            self._formatted[raw] = formatted
+        return formatted
 
 
 PATCH_LEN = 350
-PATCH_HEADER = binascii.a2b_hex('F0002029')
+PATCH_HEADER = b'\xf0\x00\x20\x29'
 PATCH_INFO = SysexInfo([
     SysexInfoSection(
         name='Voice',
@@ -456,10 +553,46 @@ PATCH_INFO = SysexInfo([
     ),
 ])
 
+# Every param of the patch and a gather of their raw values, in the same order
+_PATCH_PARAMS = tuple(param for section in PATCH_INFO for param in section)
+_gather_raws = operator.itemgetter(*(param.offset for param in _PATCH_PARAMS))
+
+def _build_gv_template(info):
+    """
+    Split the Graphviz representation of info into a `%` template and the
+    params whose values fill its slots, in order.
+    """
+
+    template = info.to_gv().replace('%', '%%')
+    slots = []
+    start = 0
+    for section in info:
+        for param in section:
+            node = param.to_gv().replace('%', '%%')
+            index = template.find(node, start)
+            if index < 0:
+                # Sections may leave params out, but a param node rendered
+                # some other way would bake its default value into the template
+                if '\t%s [' % param.gv_id in template:
+                    raise ValueError(
+                        "param %s is rendered differently from its to_gv()" % param.name
+                    )
+                continue
+            node_template = param.gv_template()
+            template = template[:index] + node_template + template[index + len(node):]
+            start = index + len(node_template)
+            slots.append(param)
+    return template, tuple(slots)
+
+# Only param values change between dumps, so the graph structure is rendered once
+_GV_TEMPLATE, _GV_VALUE_SLOTS = _build_gv_template(PATCH_INFO)
+
 def dump_sysex_patch_gv(sysex):
     """Create a graphviz representation of the SysEx patch bytestring."""
 
-    logging.info("dumping sysex:\n%s", binascii.b2a_qp(sysex))
+    log_info = logging.getLogger().isEnabledFor(logging.INFO)
+    if log_info:
+        logging.info("dumping sysex:\n%s", binascii.b2a_qp(sysex))
     assert \
         isinstance(sysex, bytes), \
         "sysex must be a bytestring"
@@ -467,8 +600,8 @@ def dump_sysex_patch_gv(sysex):
     assert \
         sysex.startswith(PATCH_HEADER), \
         "sysex should start with valid header: \n%s \ninstead: \n%s... " % (
-            binascii.b2a_hex(PATCH_HEADER),
-            binascii.b2a_hex(sysex[:len(PATCH_HEADER)])
+            PATCH_HEADER.hex(),
+            sysex[:len(PATCH_HEADER)].hex()
         )
 
     assert \
@@ -478,20 +611,22 @@ def dump_sysex_patch_gv(sysex):
             len(sysex)
         )
 
-    for info_section in PATCH_INFO:
-        group_table = []
-        for param in info_section:
-            raw = ord(sysex[param.offset])
-            param.raw = raw
-            group_table.append(['', param.name, raw, param.value])
+    for param, raw in zip(_PATCH_PARAMS, _gather_raws(sysex)):
+        param.raw = raw
 
+    if log_info:
+        patch_table = []
+        for info_section in PATCH_INFO:
+            section_name = info_section.name
+            for param in info_section.params:
+                patch_table.append([section_name, param.name, param.raw, param.value])
+                section_name = ''
         logging.info(
-            "%s\n%s",
-            info_section.name,
-            tabulate(group_table, headers=['', 'Parameter', 'raw', 'value'])
+            "\n%s",
+            _format_table(patch_table, ['Section', 'Parameter', 'raw', 'value'])
         )
 
-    return PATCH_INFO.to_gv()
+    return _GV_TEMPLATE % tuple(param.value for param in _GV_VALUE_SLOTS)
 
 def main():
     """Main function for duping sysex."""
@@ -503,9 +638,9 @@ def main():
     args = argparser.parse_args()
 
     if args:
-        gv_contents = ""
-        with io.FileIO(args.sysex_file, 'r') as raw_sysex:
-            gv_contents = dump_sysex_patch_gv(raw_sysex.readall())
+        gv_contents = dump_sysex_patch_gv(
+            pathlib.Path(args.sysex_file).read_bytes()
+        )
         if gv_contents:
             with open(args.gv_file, 'w+') as gv_file:
                 gv_file.write(gv_contents)